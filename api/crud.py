@@ -1,7 +1,10 @@
+import uuid
 from sqlalchemy.orm import Session
-from . import models, schemas, security
+from . import models, schemas, security, tasks, uploads
 from datetime import datetime, timedelta # <-- ADD THIS IMPORT
 from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+from typing import List
 
 # --- User Functions (No changes) ---
 def get_user_by_email(db: Session, email: str):
@@ -48,6 +51,84 @@ def create_user(db: Session, user: schemas.UserCreate):
     db.refresh(db_user)
     return db_user
 
+# --- REFRESH TOKEN FUNCTIONS ---
+def create_refresh_token(db: Session, user_id: int, family_id: str = None):
+    """
+    Issues a new refresh token for the user and returns the raw token string.
+    Only its hash is stored. Pass family_id when rotating an existing session.
+    """
+    purge_expired_refresh_tokens(db)
+    token = security.generate_refresh_token()
+    db_token = models.RefreshToken(
+        token_hash=security.hash_refresh_token(token),
+        family_id=family_id or uuid.uuid4().hex,
+        expires_at=datetime.utcnow() + timedelta(days=security.REFRESH_TOKEN_EXPIRE_DAYS),
+        user_id=user_id
+    )
+    db.add(db_token)
+    db.commit()
+    return token
+
+def purge_expired_refresh_tokens(db: Session):
+    """
+    Deletes expired refresh tokens (part of the caller's transaction).
+    Revoked tokens are kept until they expire so reuse can still be detected.
+    """
+    db.query(models.RefreshToken).filter(
+        models.RefreshToken.expires_at < datetime.utcnow()
+    ).delete(synchronize_session=False)
+
+def revoke_refresh_token_family(db: Session, family_id: str):
+    """Revokes every still-active token issued from the same login."""
+    db.query(models.RefreshToken).filter(
+        models.RefreshToken.family_id == family_id,
+        models.RefreshToken.revoked_at.is_(None)
+    ).update({models.RefreshToken.revoked_at: datetime.utcnow()}, synchronize_session=False)
+    db.commit()
+
+def rotate_refresh_token(db: Session, token: str):
+    """
+    Exchanges a refresh token for a new one in the same family.
+    Returns (user, new_token), or None if the token is unknown, expired or revoked.
+    Presenting an already-rotated token is treated as theft: the whole family is revoked.
+    """
+    db_token = db.query(models.RefreshToken).filter(
+        models.RefreshToken.token_hash == security.hash_refresh_token(token)
+    ).first()
+    if db_token is None:
+        return None
+
+    now = datetime.utcnow()
+    if db_token.revoked_at is not None:
+        print(f"Refresh token reuse detected for user {db_token.user_id}; revoking session.")
+        revoke_refresh_token_family(db, db_token.family_id)
+        return None
+    if db_token.expires_at <= now:
+        return None
+
+    # Conditional update so two concurrent refreshes can't both rotate the same token
+    rotated = db.query(models.RefreshToken).filter(
+        models.RefreshToken.id == db_token.id,
+        models.RefreshToken.revoked_at.is_(None)
+    ).update({models.RefreshToken.revoked_at: now}, synchronize_session=False)
+    if rotated == 0:
+        db.rollback()
+        revoke_refresh_token_family(db, db_token.family_id)
+        return None
+
+    new_token = create_refresh_token(db, user_id=db_token.user_id, family_id=db_token.family_id)
+    return db_token.user, new_token
+
+def revoke_refresh_token(db: Session, token: str):
+    """Logs out the session the token belongs to. Returns False if the token is unknown."""
+    db_token = db.query(models.RefreshToken).filter(
+        models.RefreshToken.token_hash == security.hash_refresh_token(token)
+    ).first()
+    if db_token is None:
+        return False
+    revoke_refresh_token_family(db, db_token.family_id)
+    return True
+
 def get_pending_organizers(db: Session):
     return db.query(models.User).filter(
         models.User.role == "organizer",
@@ -58,6 +139,7 @@ def approve_organizer(db: Session, user_id: int):
     db_user = db.query(models.User).filter(models.User.id == user_id).first()
     if db_user and db_user.role == "organizer":
         db_user.is_approved = True
+        tasks.enqueue(db, "send_organizer_approved", {"user_id": db_user.id})
         db.commit()
         db.refresh(db_user)
         return db_user
@@ -130,6 +212,108 @@ def create_event(db: Session, event: schemas.EventCreate, organizer_id: int):
     db.refresh(db_event)
     return db_event
 
+# --- BATCH TIMETABLE IMPORT ---
+def create_events_batch(db: Session, events: List[schemas.EventCreate], organizer_id: int):
+    """
+    Schedules a whole timetable at once.
+    Loads every existing event that could clash in one query, then does a single
+    sort-and-sweep per venue to find overlaps both against saved events and
+    within the batch itself. Saved events always win; within the batch, earlier-starting events win.
+    All valid events are inserted in one transaction.
+    Returns (created_events, conflicts) where conflicts is a list of dicts.
+    """
+    conflicts = []
+    if not events:
+        return [], conflicts
+
+    venue_ids = {event.venue_id for event in events}
+    known_venue_ids = {
+        venue_id for (venue_id,) in
+        db.query(models.Venue.id).filter(models.Venue.id.in_(venue_ids)).all()
+    }
+
+    # SQLite hands back naive datetimes, so compare the batch's times the same way
+    def naive(value: datetime):
+        return value.replace(tzinfo=None)
+
+    # Everything already booked in these venues during the batch's overall time window
+    window_start = naive(min(event.event_datetime for event in events))
+    window_end = naive(max(event.end_datetime for event in events))
+    existing_events = db.query(
+        models.Event.id, models.Event.venue_id, models.Event.event_datetime, models.Event.end_datetime
+    ).filter(
+        models.Event.venue_id.in_(known_venue_ids),
+        models.Event.event_datetime < window_end,
+        models.Event.end_datetime > window_start
+    ).all()
+
+    # Per venue: (start, end, source, ref) where source 0 = saved event (ref = id), 1 = batch (ref = index).
+    # Sorting puts saved events ahead of batch events that start at the same moment.
+    timelines = {venue_id: [] for venue_id in known_venue_ids}
+    for existing in existing_events:
+        timelines[existing.venue_id].append((existing.event_datetime, existing.end_datetime, 0, existing.id))
+    for index, event in enumerate(events):
+        if event.venue_id not in known_venue_ids:
+            conflicts.append({
+                "index": index, "title": event.title, "venue_id": event.venue_id,
+                "reason": "Venue not found."
+            })
+            continue
+        timelines[event.venue_id].append((naive(event.event_datetime), naive(event.end_datetime), 1, index))
+
+    def reject(ref, venue_id, reason, conflicting_event_id=None, conflicting_index=None):
+        conflicts.append({
+            "index": ref, "title": events[ref].title, "venue_id": venue_id, "reason": reason,
+            "conflicting_event_id": conflicting_event_id, "conflicting_index": conflicting_index,
+        })
+
+    accepted = []
+    for venue_id, timeline in timelines.items():
+        timeline.sort(key=lambda item: (item[0], item[2], item[3]))
+
+        # Pass 1: saved events always win. A batch event clashes with a saved one if
+        # an earlier saved event is still running when it starts (forward sweep), or
+        # the next saved event starts before it ends (backward sweep).
+        clashes = {}
+        latest_end = None   # (end, id) of the saved event ending last so far
+        for start, end, source, ref in timeline:
+            if source == 0:
+                if latest_end is None or end > latest_end[0]:
+                    latest_end = (end, ref)
+            elif latest_end is not None and start < latest_end[0]:
+                clashes[ref] = latest_end[1]
+        next_start = None   # (start, id) of the earliest saved event from here on
+        for start, end, source, ref in reversed(timeline):
+            if source == 0:
+                next_start = (start, ref)
+            elif ref not in clashes and next_start is not None and next_start[0] < end:
+                clashes[ref] = next_start[1]
+        for ref, event_id in clashes.items():
+            reject(ref, venue_id, "Overlaps an existing event at this venue.", conflicting_event_id=event_id)
+
+        # Pass 2: among the remaining batch events, earlier-starting ones win
+        blocker = None      # (end, index) of the kept batch event ending last so far
+        for start, end, source, ref in timeline:
+            if source == 0 or ref in clashes:
+                continue
+            if blocker is not None and start < blocker[0]:
+                reject(ref, venue_id, "Overlaps another event in this batch at this venue.", conflicting_index=blocker[1])
+                continue
+            accepted.append(ref)
+            if blocker is None or end > blocker[0]:
+                blocker = (end, ref)
+
+    accepted.sort()
+    created = [models.Event(**events[index].model_dump(), organizer_id=organizer_id) for index in accepted]
+    if created:
+        db.add_all(created)
+        db.commit()
+        for db_event in created:
+            db.refresh(db_event)
+
+    conflicts.sort(key=lambda conflict: conflict["index"])
+    return created, conflicts
+
 # --- (get_events_by_organizer remains the same) ---
 def get_events_by_organizer(db: Session, organizer_id: int):
      return db.query(models.Event).filter(models.Event.organizer_id == organizer_id).order_by(models.Event.event_datetime).all()
@@ -145,6 +329,31 @@ def get_event_by_id(db: Session, event_id: int):
     """Gets a single event by its ID."""
     return db.query(models.Event).filter(models.Event.id == event_id).first()
 
+# Bookings in these states count against an event's capacity
+SEAT_HOLDING_STATUSES = (models.BookingStatus.CONFIRMED, models.BookingStatus.PENDING_PAYMENT)
+# A paid booking must get its payment proof uploaded within this long or it loses the seat
+PAYMENT_DEADLINE_HOURS = 24
+
+def is_payment_hold_expired(db_booking: models.Booking):
+    return (
+        db_booking.status == models.BookingStatus.PENDING_PAYMENT
+        and db_booking.payment_proof_path is None
+        and db_booking.booking_time < datetime.utcnow() - timedelta(hours=PAYMENT_DEADLINE_HOURS)
+    )
+
+def release_expired_payment_holds(db: Session, event_id: int):
+    """
+    Cancels the event's unpaid bookings whose payment deadline has passed, freeing their seats.
+    Bookings with a proof awaiting review keep their seat. Part of the caller's transaction.
+    """
+    cutoff = datetime.utcnow() - timedelta(hours=PAYMENT_DEADLINE_HOURS)
+    return db.query(models.Booking).filter(
+        models.Booking.event_id == event_id,
+        models.Booking.status == models.BookingStatus.PENDING_PAYMENT,
+        models.Booking.payment_proof_path.is_(None),
+        models.Booking.booking_time < cutoff
+    ).update({models.Booking.status: models.BookingStatus.CANCELLED}, synchronize_session="fetch")
+
 def get_booking_by_attendee_and_event(db: Session, attendee_id: int, event_id: int):
     """Checks if a specific attendee has already booked a specific event."""
     return db.query(models.Booking).filter(
@@ -152,6 +361,12 @@ def get_booking_by_attendee_and_event(db: Session, attendee_id: int, event_id: i
         models.Booking.event_id == event_id
     ).first()
 
+def is_duplicate_booking_error(error: IntegrityError):
+    """True if the error comes from the uq_bookings_event_attendee unique index."""
+    message = str(error.orig)
+    # SQLite names the columns, other databases name the index
+    return "uq_bookings_event_attendee" in message or "bookings.event_id, bookings.attendee_id" in message
+
 def create_booking(db: Session, event_id: int, attendee_id: int):
     """Creates a new booking for an attendee."""
     
@@ -160,35 +375,61 @@ def create_booking(db: Session, event_id: int, attendee_id: int):
     if not db_event:
         return {"error": "Event not found."}
 
-    # 2. Check if user already booked this event
+    # 2. Free seats held by unpaid bookings past their payment deadline
+    release_expired_payment_holds(db, event_id)
+
+    # 3. Check if user already booked this event
     existing_booking = get_booking_by_attendee_and_event(db, attendee_id, event_id)
-    if existing_booking:
-        # Allow re-booking only if cancelled? Or just prevent duplicates?
-        # For now, prevent duplicates unless cancelled.
-        if existing_booking.status != models.BookingStatus.CANCELLED:
-             return {"error": "You have already booked this event."}
-        # If cancelled, potentially allow re-booking by updating status? Or create new? Let's create new for now.
-
-    # 3. Check for capacity
-    # Count current *confirmed* bookings for this event
+    if existing_booking and existing_booking.status in SEAT_HOLDING_STATUSES:
+        return {"error": "You have already booked this event."}
+    # A cancelled (or payment-rejected) booking is reused below instead of adding a new row
+
+    # 4. Check for capacity
+    # Bookings awaiting payment (within the deadline) or verification hold their seat too
     current_bookings_count = db.query(models.Booking).filter(
         models.Booking.event_id == event_id,
-        models.Booking.status == models.BookingStatus.CONFIRMED # Only count confirmed
-        # Add PENDING_PAYMENT later if implementing paid flow
+        models.Booking.status.in_(SEAT_HOLDING_STATUSES)
     ).count()
 
     if current_bookings_count >= db_event.capacity:
         return {"error": "Sorry, this event is already full."}
 
-    # 4. Create the booking (Assume free event for now -> CONFIRMED)
-    #    (Later, we'll check event type and set to PENDING_PAYMENT if needed)
-    db_booking = models.Booking(
-        attendee_id=attendee_id,
-        event_id=event_id,
-        status=models.BookingStatus.CONFIRMED # Default to confirmed for now
-    )
-    db.add(db_booking)
-    db.commit()
+    # 5. Create the booking: free events are confirmed straight away,
+    #    paid events wait for the organizer to verify the payment proof
+    is_paid = db_event.cost > 0
+    new_status = models.BookingStatus.PENDING_PAYMENT if is_paid else models.BookingStatus.CONFIRMED
+    old_proof_path = None
+    if existing_booking:
+        db_booking = existing_booking
+        old_proof_path = db_booking.payment_proof_path
+        # Keep a rejected proof's hash so the same proof can't be submitted again
+        if db_booking.status != models.BookingStatus.REJECTED:
+            db_booking.payment_proof_sha256 = None
+        db_booking.status = new_status
+        db_booking.booking_time = datetime.utcnow()
+        db_booking.payment_proof_path = None
+        db_booking.payment_submitted_at = None
+    else:
+        db_booking = models.Booking(
+            attendee_id=attendee_id,
+            event_id=event_id,
+            status=new_status
+        )
+        db.add(db_booking)
+    try:
+        if not is_paid:
+            db.flush() # Assigns db_booking.id so the confirmation job can reference it
+            # Confirmation email is sent by a background worker, not in this request
+            tasks.enqueue(db, "send_booking_confirmation", {"booking_id": db_booking.id})
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        if not is_duplicate_booking_error(e):
+            raise
+        # A concurrent request inserted the same (event, attendee) booking after our check
+        return {"error": "You have already booked this event."}
+    # The previous round's proof is no longer referenced by any booking
+    uploads.remove_file(old_proof_path)
     db.refresh(db_booking)
     
     # Eager load event details for the response
@@ -196,4 +437,100 @@ def create_booking(db: Session, event_id: int, attendee_id: int):
     db.refresh(db_booking.event.venue)
     db.refresh(db_booking.event.organizer)
 
-    return db_booking # Return the successful booking object
\ No newline at end of file
+    return db_booking # Return the successful booking object
+
+def cancel_booking(db: Session, booking_id: int, attendee_id: int):
+    """
+    Cancels an attendee's booking and releases the seat.
+    A single-row update: capacity is always counted from booking statuses,
+    so nothing else needs adjusting. Any payment proof stays attached as a
+    record; it is deleted if the attendee books the event again.
+    """
+    cancelled = db.query(models.Booking).filter(
+        models.Booking.id == booking_id,
+        models.Booking.attendee_id == attendee_id,
+        models.Booking.status.in_(SEAT_HOLDING_STATUSES)
+    ).update({models.Booking.status: models.BookingStatus.CANCELLED}, synchronize_session=False)
+    db.commit()
+
+    db_booking = get_booking_by_id(db, booking_id)
+    if db_booking is None or db_booking.attendee_id != attendee_id:
+        return {"error": "Booking not found."}
+    if not cancelled:
+        return {"error": "Only active bookings can be cancelled."}
+    return db_booking
+
+# --- PAYMENT VERIFICATION FUNCTIONS ---
+def get_booking_by_id(db: Session, booking_id: int):
+    return db.query(models.Booking).filter(models.Booking.id == booking_id).first()
+
+def is_payment_proof_reused(db: Session, db_booking: models.Booking, sha256: str):
+    """
+    True if this exact proof was already used: by another booking, or by this
+    booking in an earlier (rejected) round. Re-uploading the proof that is
+    currently attached is allowed.
+    """
+    if db_booking.payment_proof_sha256 == sha256:
+        return db_booking.payment_proof_path is None
+    return db.query(models.Booking.id).filter(
+        models.Booking.payment_proof_sha256 == sha256,
+        models.Booking.id != db_booking.id
+    ).first() is not None
+
+def attach_payment_proof(db: Session, db_booking: models.Booking, path: str, sha256: str):
+    db_booking.payment_proof_path = path
+    db_booking.payment_proof_sha256 = sha256
+    db_booking.payment_submitted_at = datetime.utcnow()
+    db.commit()
+    db.refresh(db_booking)
+
+    # Load event details for the response here, not lazily while serializing
+    db.refresh(db_booking.event)
+    db.refresh(db_booking.event.venue)
+    db.refresh(db_booking.event.organizer)
+    return db_booking
+
+def get_pending_payments(db: Session, organizer_id: int):
+    """Bookings with a submitted proof waiting for this organizer's review, oldest first."""
+    return db.query(models.Booking).join(models.Event).filter(
+        models.Event.organizer_id == organizer_id,
+        models.Booking.status == models.BookingStatus.PENDING_PAYMENT,
+        models.Booking.payment_proof_path.isnot(None)
+    ).order_by(models.Booking.payment_submitted_at).all()
+
+def review_payments(db: Session, organizer_id: int, decisions: List[schemas.PaymentDecision]):
+    """
+    Approves or rejects many pending payments in one transaction.
+    Capacity needs no check here: a booking with a proof already holds its seat
+    (it never expires), so approving just keeps it and rejecting releases it.
+    Returns one result dict per decision, in the same order.
+    """
+    booking_ids = [decision.booking_id for decision in decisions]
+    bookings = {
+        db_booking.id: db_booking for db_booking in
+        db.query(models.Booking).join(models.Event).filter(
+            models.Booking.id.in_(booking_ids),
+            models.Event.organizer_id == organizer_id
+        ).all()
+    }
+
+    results = []
+    for decision in decisions:
+        db_booking = bookings.get(decision.booking_id)
+        if db_booking is None:
+            results.append({"booking_id": decision.booking_id, "error": "Booking not found."})
+            continue
+        if db_booking.status != models.BookingStatus.PENDING_PAYMENT or db_booking.payment_proof_path is None:
+            results.append({"booking_id": db_booking.id, "status": db_booking.status,
+                            "error": "Booking is not awaiting payment verification."})
+            continue
+
+        if decision.approve:
+            db_booking.status = models.BookingStatus.CONFIRMED
+        else:
+            db_booking.status = models.BookingStatus.REJECTED
+        tasks.enqueue(db, "send_payment_review_result", {"booking_id": db_booking.id})
+        results.append({"booking_id": db_booking.id, "status": db_booking.status})
+
+    db.commit()
+    return results
@@ -1,5 +1,6 @@
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
@@ -25,4 +26,28 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def upgrade_schema(metadata):
+    """
+    create_all() only creates missing tables. This adds the columns and indexes
+    that were later added to existing tables, so an older festfrenzy.db keeps working.
+    New columns on existing tables must be nullable (SQLite can't add NOT NULL columns).
+    """
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing_columns:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+            for index in table.indexes:
+                try:
+                    with connection.begin_nested():
+                        index.create(connection, checkfirst=True)
+                except IntegrityError as e:
+                    # e.g. duplicate rows already in the table; the app still runs without it
+                    print(f"Could not create index {index.name}: {e.orig}")
@@ -1,16 +1,28 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, BackgroundTasks, Depends, HTTPException, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 from fastapi.security import OAuth2PasswordRequestForm
+from fastapi.concurrency import run_in_threadpool
 from datetime import timedelta
 from typing import List
-from . import security, crud, models, schemas
-from .database import SessionLocal, engine, get_db
+from . import security, crud, models, schemas, tasks, uploads
+from .database import SessionLocal, engine, get_db, upgrade_schema
 
 models.Base.metadata.create_all(bind=engine)
+upgrade_schema(models.Base.metadata)
 
 app = FastAPI()
 
+# --- Background job workers (emails etc.) run for the lifetime of the app ---
+# (Not on Vercel; there routes drain the queue after responding, see tasks.py)
+@app.on_event("startup")
+def start_background_workers():
+    tasks.start_workers()
+
+@app.on_event("shutdown")
+def stop_background_workers():
+    tasks.stop_workers()
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -111,11 +123,40 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db:
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    return issue_tokens(db, user)
+
+def issue_tokens(db: Session, user: models.User, refresh_token: str = None):
+    """Builds the token response: a short-lived access token plus a refresh token."""
     access_token_expires = timedelta(minutes=security.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = security.create_access_token(
         data={"sub": user.email}, expires_delta=access_token_expires
     )
-    return {"access_token": access_token, "token_type": "bearer"}
+    if refresh_token is None:
+        refresh_token = crud.create_refresh_token(db, user_id=user.id)
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+@app.post("/api/token/refresh", response_model=schemas.Token)
+def refresh_access_token(request: schemas.RefreshRequest, db: Session = Depends(get_db)):
+    """
+    Extends a session without re-entering the password.
+    The refresh token is rotated: the old one stops working and a new one is returned.
+    """
+    result = crud.rotate_refresh_token(db, token=request.refresh_token)
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    user, new_refresh_token = result
+    return issue_tokens(db, user, refresh_token=new_refresh_token)
+
+@app.post("/api/logout", status_code=status.HTTP_204_NO_CONTENT)
+def logout(request: schemas.RefreshRequest, db: Session = Depends(get_db)):
+    """
+    Revokes the refresh token (and every token rotated from the same login).
+    """
+    crud.revoke_refresh_token(db, token=request.refresh_token)
 
 # --- ADD NEW UNIFIED SIGNUP ENDPOINT ---
 @app.post("/api/signup", response_model=schemas.User, status_code=status.HTTP_201_CREATED)
@@ -149,14 +190,37 @@ def get_all_pending_organizers(
 @app.post("/api/admin/approve-organizer/{user_id}", response_model=schemas.User)
 def approve_organizer_by_id(
     user_id: int,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     admin_user: models.User = Depends(security.get_current_admin_user)
 ):
     db_user = crud.approve_organizer(db, user_id=user_id)
     if db_user is None:
         raise HTTPException(status_code=404, detail="Organizer not found or already approved")
+    tasks.schedule_drain(background_tasks) # Sends the approval email after responding
     return db_user
 
+@app.get("/api/admin/queue-stats", response_model=schemas.QueueStats)
+def read_queue_stats(
+    db: Session = Depends(get_db),
+    admin_user: models.User = Depends(security.get_current_admin_user)
+):
+    """
+    Admin-only route to monitor the background job queue (depth and latency).
+    """
+    return tasks.get_queue_stats(db)
+
+@app.get("/api/cron/run-jobs")
+def run_due_jobs(request: Request, db: Session = Depends(get_db)):
+    """
+    Drains due background jobs. Called by the Vercel cron (see vercel.json) to
+    pick up retries and anything an after-response drain missed.
+    """
+    if not tasks.CRON_SECRET or request.headers.get("authorization") != f"Bearer {tasks.CRON_SECRET}":
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid cron secret")
+    tasks.run_maintenance(db)
+    return {"jobs_run": tasks.run_pending_jobs(db, max_jobs=tasks.CRON_MAX_JOBS)}
+
 @app.get("/api/venues", response_model=List[schemas.Venue])
 def read_all_venues(db: Session = Depends(get_db)):
     """
@@ -221,6 +285,26 @@ def create_new_event(
         
     return db_event
 
+@app.post("/api/organizer/events/batch", response_model=schemas.EventBatchResult, status_code=status.HTTP_201_CREATED)
+def create_event_batch(
+    batch: schemas.EventBatchCreate,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(security.get_current_user)
+):
+    """
+    Organizer-only route to schedule a whole timetable in one request.
+    Valid events are created together; the rest are listed in the conflict report.
+    Responds 201 if anything was created, otherwise 200 with just the report.
+    """
+    if current_user.role != "organizer":
+         raise HTTPException(status_code=403, detail="Only organizers can create events")
+
+    created, conflicts = crud.create_events_batch(db=db, events=batch.events, organizer_id=current_user.id)
+    if not created:
+        response.status_code = status.HTTP_200_OK
+    return {"created": created, "conflicts": conflicts}
+
 @app.get("/api/organizer/events", response_model=List[schemas.Event])
 def read_organizer_events(
     db: Session = Depends(get_db),
@@ -245,6 +329,7 @@ def read_upcoming_events(db: Session = Depends(get_db)):
 @app.post("/api/events/{event_id}/book", response_model=schemas.Booking)
 def book_event_for_attendee(
     event_id: int,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(security.get_current_user) # Require login
 ):
@@ -269,4 +354,105 @@ def book_event_for_attendee(
         raise HTTPException(status_code=status_code, detail=error_detail)
 
     # If no error, result is the booking object
-    return result
\ No newline at end of file
+    tasks.schedule_drain(background_tasks) # Sends the confirmation email after responding
+    return result
+
+@app.post("/api/bookings/{booking_id}/cancel", response_model=schemas.Booking)
+def cancel_booking_for_attendee(
+    booking_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(security.get_current_user)
+):
+    """
+    Cancels the current user's booking and frees the seat.
+    Booking the same event again later reuses this booking.
+    """
+    result = crud.cancel_booking(db=db, booking_id=booking_id, attendee_id=current_user.id)
+
+    if isinstance(result, dict) and "error" in result:
+        error_detail = result["error"]
+        status_code = 404 if "not found" in error_detail.lower() else 409
+        raise HTTPException(status_code=status_code, detail=error_detail)
+
+    return result
+
+def get_booking_awaiting_payment(
+    booking_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(security.get_current_user)
+):
+    """
+    Dependency that loads the current user's booking and checks it still needs a payment proof.
+    Being sync, it runs in the threadpool like the other routes' DB work.
+    """
+    db_booking = crud.get_booking_by_id(db, booking_id=booking_id)
+    if db_booking is None or db_booking.attendee_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Booking not found")
+    if db_booking.status != models.BookingStatus.PENDING_PAYMENT:
+        raise HTTPException(status_code=409, detail="This booking is not awaiting payment.")
+    if crud.is_payment_hold_expired(db_booking):
+        raise HTTPException(status_code=409, detail="The payment deadline for this booking has passed. Please book again.")
+    return db_booking
+
+@app.post("/api/bookings/{booking_id}/payment-proof", response_model=schemas.Booking)
+async def upload_payment_proof(
+    request: Request,
+    db: Session = Depends(get_db),
+    db_booking: models.Booking = Depends(get_booking_awaiting_payment)
+):
+    """
+    Attendee uploads proof of payment for a paid event (multipart form, one file).
+    The file is streamed to disk, so large uploads never sit in memory.
+    This route is async only so it can read the request stream; every database
+    call is pushed to the threadpool so it never blocks the event loop.
+    """
+    temp_path, sha256, extension = await uploads.receive_payment_proof(request)
+    try:
+        reused = await run_in_threadpool(
+            crud.is_payment_proof_reused, db, db_booking=db_booking, sha256=sha256
+        )
+        if reused:
+            raise HTTPException(status_code=409, detail="This payment proof has already been submitted.")
+        path = uploads.store_payment_proof(temp_path, sha256, extension)
+    finally:
+        uploads.remove_file(temp_path) # No-op once the file has been moved into place
+
+    old_path = db_booking.payment_proof_path
+    db_booking = await run_in_threadpool(
+        crud.attach_payment_proof, db, db_booking=db_booking, path=path, sha256=sha256
+    )
+    # A re-upload replaces the previous proof; proofs are never shared between bookings
+    if old_path and old_path != path:
+        uploads.remove_file(old_path)
+    return db_booking
+
+@app.get("/api/organizer/payments/pending", response_model=List[schemas.Booking])
+def read_pending_payments(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(security.get_current_user)
+):
+    """
+    Organizer-only route listing submitted payment proofs for their events, oldest first.
+    """
+    if current_user.role != "organizer":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    return crud.get_pending_payments(db=db, organizer_id=current_user.id)
+
+@app.post("/api/organizer/payments/review", response_model=List[schemas.PaymentReviewResult])
+def review_pending_payments(
+    review: schemas.PaymentReviewRequest,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(security.get_current_user)
+):
+    """
+    Organizer-only route to approve or reject many payments at once.
+    All decisions are saved in a single transaction; skipped ones carry an error.
+    """
+    if current_user.role != "organizer":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    results = crud.review_payments(db=db, organizer_id=current_user.id, decisions=review.decisions)
+    tasks.schedule_drain(background_tasks) # Sends the review result emails after responding
+    return results
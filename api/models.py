@@ -1,5 +1,5 @@
 import enum
-from sqlalchemy import Column, Integer, String, Boolean, Enum, ForeignKey, DateTime, Float
+from sqlalchemy import Column, Integer, String, Boolean, Enum, ForeignKey, DateTime, Float, Text, Index, LargeBinary
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .database import Base
@@ -11,6 +11,13 @@ class BookingStatus(str, enum.Enum):
     REJECTED = "rejected"             # If payment is rejected
     CANCELLED = "cancelled"           # If attendee cancels
 
+# --- Background Job Status Enum ---
+class JobStatus(str, enum.Enum):
+    PENDING = "pending"   # Waiting to be picked up (or waiting for a retry)
+    RUNNING = "running"   # Claimed by a worker
+    DONE = "done"         # Handler finished successfully
+    FAILED = "failed"     # Gave up after max_attempts
+
 class UserRole(str, enum.Enum):
     attendee = "attendee"
     organizer = "organizer"
@@ -28,6 +35,7 @@ class User(Base):
     events = relationship("Event", back_populates="organizer")
     # --- ADD RELATIONSHIP TO BOOKINGS (as attendee) ---
     bookings = relationship("Booking", back_populates="attendee")
+    refresh_tokens = relationship("RefreshToken", back_populates="user")
 
 class Venue(Base):
     __tablename__ = "venues"
@@ -58,14 +66,62 @@ class Event(Base):
 # --- ADD THIS NEW BOOKING MODEL ---
 class Booking(Base):
     __tablename__ = "bookings"
+    __table_args__ = (
+        # One row per (event, attendee); cancelling and re-booking reuse it
+        # (a unique index rather than a constraint so upgrade_schema can add it to an existing table)
+        Index("uq_bookings_event_attendee", "event_id", "attendee_id", unique=True),
+        # Capacity checks count by (event_id, status) straight from this index
+        Index("ix_bookings_event_status", "event_id", "status"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     booking_time = Column(DateTime, default=datetime.utcnow)
     status = Column(Enum(BookingStatus), nullable=False, default=BookingStatus.CONFIRMED)
-    # payment_proof_url = Column(String, nullable=True) # Add later if needed for paid events
+    # --- Payment proof for paid events (see uploads.py) ---
+    payment_proof_path = Column(String, nullable=True)
+    payment_proof_sha256 = Column(String(64), index=True, nullable=True) # Spots the same proof reused across bookings
+    payment_submitted_at = Column(DateTime, nullable=True)
 
     attendee_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     event_id = Column(Integer, ForeignKey("events.id"), nullable=False)
 
     attendee = relationship("User", back_populates="bookings")
-    event = relationship("Event", back_populates="bookings")
\ No newline at end of file
+    event = relationship("Event", back_populates="bookings")
+
+# --- Background Job Queue Table (see tasks.py) ---
+class Job(Base):
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # Workers poll for the oldest due pending job
+        Index("ix_jobs_status_run_at", "status", "run_at"),
+        # Stats sample the latest DONE jobs; retention deletes the oldest ones
+        Index("ix_jobs_status_finished_at", "status", "finished_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)
+    payload = Column(Text, nullable=False, default="{}") # JSON-encoded handler kwargs
+    status = Column(Enum(JobStatus), nullable=False, default=JobStatus.PENDING)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    last_error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    run_at = Column(DateTime, nullable=False, default=datetime.utcnow) # Not picked up before this time (backoff)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+# --- Refresh Tokens (only the SHA-256 digest is stored, never the token itself) ---
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+
+    id = Column(Integer, primary_key=True, index=True)
+    token_hash = Column(LargeBinary(32), unique=True, index=True, nullable=False)
+    # Every token issued from one login shares a family; reuse of a rotated token revokes the whole family
+    family_id = Column(String(32), index=True, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = Column(DateTime, index=True, nullable=False) # Indexed for purging expired rows
+    revoked_at = Column(DateTime, nullable=True) # Set on rotation, logout or reuse detection
+
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user = relationship("User", back_populates="refresh_tokens")
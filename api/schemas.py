@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr, field_validator, root_validator, confloat
-from typing import Optional
+from pydantic import BaseModel, EmailStr, Field, field_validator, root_validator, confloat
+from typing import List, Optional
 from datetime import datetime 
 from . import models
 import enum
@@ -38,6 +38,10 @@ class UserCreate(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 class TokenData(BaseModel):
     email: Optional[str] = None
@@ -96,6 +100,24 @@ class Event(EventBase):
     class Config:
         from_attributes = True
 
+# --- BATCH TIMETABLE IMPORT SCHEMAS ---
+MAX_BATCH_EVENTS = 500 # Keeps one timetable import to a reasonably sized transaction
+
+class EventBatchCreate(BaseModel):
+    events: List[EventCreate] = Field(..., min_length=1, max_length=MAX_BATCH_EVENTS)
+
+class EventConflict(BaseModel):
+    index: int                                   # Position of the rejected event in the submitted batch
+    title: str
+    venue_id: int
+    reason: str
+    conflicting_event_id: Optional[int] = None   # Set when it clashes with an already saved event
+    conflicting_index: Optional[int] = None      # Set when it clashes with another event in the batch
+
+class EventBatchResult(BaseModel):
+    created: List[Event]
+    conflicts: List[EventConflict]
+
 class BookingStatus(str, enum.Enum):
     PENDING_PAYMENT = "pending_payment"
     CONFIRMED = "confirmed"
@@ -115,8 +137,33 @@ class Booking(BookingBase):
     attendee_id: int
     booking_time: datetime
     status: BookingStatus
+    payment_proof_sha256: Optional[str] = None
+    payment_submitted_at: Optional[datetime] = None
     event: Event # Include full event details
 
     class Config:
         from_attributes = True
 
+# --- BACKGROUND QUEUE MONITORING SCHEMA ---
+class QueueStats(BaseModel):
+    pending: int
+    running: int
+    done: int
+    failed: int
+    oldest_pending_age_seconds: Optional[float] = None
+    avg_wait_seconds: Optional[float] = None # Enqueue -> picked up by a worker
+    avg_run_seconds: Optional[float] = None  # Picked up -> finished
+    workers: int
+
+# --- PAYMENT REVIEW SCHEMAS ---
+class PaymentDecision(BaseModel):
+    booking_id: int
+    approve: bool
+
+class PaymentReviewRequest(BaseModel):
+    decisions: List[PaymentDecision]
+
+class PaymentReviewResult(BaseModel):
+    booking_id: int
+    status: Optional[BookingStatus] = None
+    error: Optional[str] = None # Set when this decision was skipped
@@ -0,0 +1,396 @@
+import json
+import os
+import smtplib
+import threading
+import traceback
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import SessionLocal
+
+# --- Queue Settings ---
+# Worker threads need a long-running process (e.g. `uvicorn api.main:app`).
+# On Vercel (which sets VERCEL=1) each request is a short-lived serverless
+# invocation, so threads are not started there. Instead routes that enqueue
+# mail call schedule_drain(), which runs due jobs after the response is sent.
+# The daily Vercel cron in vercel.json (/api/cron/run-jobs) only sweeps up
+# retries whose backoff had not elapsed and jobs a drain missed.
+USE_WORKER_THREADS = not os.getenv("VERCEL")
+CRON_SECRET = os.getenv("CRON_SECRET") # Vercel sends it as "Authorization: Bearer <secret>"
+CRON_MAX_JOBS = 200           # Keeps one cron invocation inside the function time limit
+WORKER_COUNT = 2
+POLL_INTERVAL_SECONDS = 1.0
+RETRY_BASE_SECONDS = 5        # 5s, 10s, 20s, 40s ... between attempts
+RETRY_MAX_SECONDS = 600
+STALE_JOB_SECONDS = 300       # A RUNNING job older than this is assumed to be from a dead worker
+MAINTENANCE_INTERVAL_SECONDS = 60 # How often one worker requeues stale jobs while the app is up
+DONE_JOB_RETENTION_DAYS = 7   # Finished jobs older than this are deleted; FAILED jobs are kept for inspection
+LATENCY_SAMPLE_SIZE = 100     # How many recent finished jobs to average for the stats endpoint
+
+# --- Mail Settings ---
+# If SMTP_HOST is not set, mail goes to the in-memory sink below (local dev and tests).
+SMTP_HOST = os.getenv("SMTP_HOST")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_USER = os.getenv("SMTP_USER")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+MAIL_FROM = os.getenv("MAIL_FROM", "noreply@festfrenzy.com")
+
+
+# --- Mailers ---
+class SMTPMailer:
+    """Sends mail through a real SMTP server."""
+
+    def send(self, message: EmailMessage):
+        with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=10) as server:
+            server.starttls()
+            if SMTP_USER:
+                server.login(SMTP_USER, SMTP_PASSWORD)
+            server.send_message(message)
+
+
+class MemorySink:
+    """
+    Local stand-in for an SMTP server. Keeps every sent message in memory
+    so tests (and local dev) can inspect what would have been mailed.
+    """
+
+    def __init__(self):
+        self.messages: List[EmailMessage] = []
+        self._lock = threading.Lock()
+
+    def send(self, message: EmailMessage):
+        with self._lock:
+            self.messages.append(message)
+        print(f"[mail sink] To: {message['To']} | Subject: {message['Subject']}")
+
+    def clear(self):
+        with self._lock:
+            self.messages.clear()
+
+
+mailer = SMTPMailer() if SMTP_HOST else MemorySink()
+
+def set_mailer(new_mailer):
+    """Swap the mailer, e.g. install a fresh MemorySink in a test."""
+    global mailer
+    mailer = new_mailer
+
+def send_email(to: str, subject: str, body: str):
+    message = EmailMessage()
+    message["From"] = MAIL_FROM
+    message["To"] = to
+    message["Subject"] = subject
+    message.set_content(body)
+    mailer.send(message)
+
+
+# --- Task Registry ---
+TASKS: Dict[str, Callable] = {}
+
+def task(name: str):
+    """Registers a function as a job handler. Handlers are called as handler(db, **payload)."""
+    def decorator(fn: Callable):
+        TASKS[name] = fn
+        return fn
+    return decorator
+
+def enqueue(db: Session, kind: str, payload: Optional[dict] = None, max_attempts: int = 5):
+    """
+    Adds a job to the queue as part of the caller's transaction.
+    The job only becomes visible to workers once the caller commits,
+    so a rolled-back write never sends its side effects.
+    """
+    if kind not in TASKS:
+        raise ValueError(f"Unknown task: {kind}")
+    db_job = models.Job(
+        kind=kind,
+        payload=json.dumps(payload or {}),
+        max_attempts=max_attempts,
+    )
+    db.add(db_job)
+    # Workers are woken once the caller commits (see _wake_workers_after_commit)
+    db.info["wake_workers"] = True
+    return db_job
+
+@event.listens_for(Session, "after_commit")
+def _wake_workers_after_commit(session: Session):
+    # Waking any earlier would let a worker poll before the job is visible
+    if session.info.pop("wake_workers", False) and pool is not None:
+        pool.wake()
+
+@event.listens_for(Session, "after_rollback")
+def _forget_wake_after_rollback(session: Session):
+    session.info.pop("wake_workers", None)
+
+
+# --- Job Handlers ---
+@task("send_booking_confirmation")
+def send_booking_confirmation(db: Session, booking_id: int):
+    db_booking = db.query(models.Booking).filter(models.Booking.id == booking_id).first()
+    if db_booking is None:
+        return # Booking was deleted before we got to it; nothing to send
+    event = db_booking.event
+    send_email(
+        to=db_booking.attendee.email,
+        subject=f"Booking confirmed: {event.title}",
+        body=(
+            f"Hi {db_booking.attendee.name},\n\n"
+            f"Your booking for '{event.title}' is confirmed.\n"
+            f"When: {event.event_datetime:%d %b %Y, %H:%M} - {event.end_datetime:%H:%M}\n"
+            f"Where: {event.venue.name}, {event.venue.location}\n\n"
+            f"See you there!\nFestFrenzy"
+        ),
+    )
+
+@task("send_organizer_approved")
+def send_organizer_approved(db: Session, user_id: int):
+    db_user = db.query(models.User).filter(models.User.id == user_id).first()
+    if db_user is None:
+        return
+    send_email(
+        to=db_user.email,
+        subject="Your FestFrenzy organizer account has been approved",
+        body=(
+            f"Hi {db_user.name},\n\n"
+            f"An admin has approved your organizer account. "
+            f"You can now log in and start creating events.\n\nFestFrenzy"
+        ),
+    )
+
+
+@task("send_payment_review_result")
+def send_payment_review_result(db: Session, booking_id: int):
+    db_booking = db.query(models.Booking).filter(models.Booking.id == booking_id).first()
+    if db_booking is None:
+        return
+    event = db_booking.event
+    if db_booking.status == models.BookingStatus.CONFIRMED:
+        subject = f"Payment verified: {event.title}"
+        outcome = "Your payment has been verified and your booking is confirmed."
+    else:
+        subject = f"Payment not accepted: {event.title}"
+        outcome = (
+            "The organizer could not verify your payment, so your booking was not confirmed. "
+            "Please contact the organizer if you think this is a mistake."
+        )
+    send_email(
+        to=db_booking.attendee.email,
+        subject=subject,
+        body=f"Hi {db_booking.attendee.name},\n\n{outcome}\n\nFestFrenzy",
+    )
+
+
+# --- Worker Pool ---
+def _backoff(attempts: int) -> timedelta:
+    return timedelta(seconds=min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS))
+
+def _claim_next_job(db: Session):
+    """
+    Atomically moves the oldest due PENDING job to RUNNING.
+    Returns the job, or None if there is nothing to do.
+    """
+    now = datetime.utcnow()
+    candidate = db.query(models.Job.id).filter(
+        models.Job.status == models.JobStatus.PENDING,
+        models.Job.run_at <= now
+    ).order_by(models.Job.run_at).first()
+    if candidate is None:
+        return None
+
+    # Only one worker can win this UPDATE; the others see rowcount == 0
+    claimed = db.query(models.Job).filter(
+        models.Job.id == candidate.id,
+        models.Job.status == models.JobStatus.PENDING
+    ).update({
+        models.Job.status: models.JobStatus.RUNNING,
+        models.Job.started_at: now,
+        models.Job.attempts: models.Job.attempts + 1,
+    }, synchronize_session=False)
+    db.commit()
+    if claimed == 0:
+        return None
+    return db.query(models.Job).filter(models.Job.id == candidate.id).first()
+
+def run_job(db: Session, db_job: models.Job):
+    """Runs a claimed job and records the outcome (done, retry later, or failed)."""
+    try:
+        handler = TASKS[db_job.kind]
+        handler(db, **json.loads(db_job.payload))
+    except Exception as e:
+        db.rollback()
+        print(f"Job {db_job.id} ({db_job.kind}) failed on attempt {db_job.attempts}: {e}")
+        db_job.last_error = traceback.format_exc()
+        if db_job.attempts >= db_job.max_attempts:
+            db_job.status = models.JobStatus.FAILED
+            db_job.finished_at = datetime.utcnow()
+        else:
+            db_job.status = models.JobStatus.PENDING
+            db_job.run_at = datetime.utcnow() + _backoff(db_job.attempts)
+    else:
+        db_job.status = models.JobStatus.DONE
+        db_job.finished_at = datetime.utcnow()
+        db_job.last_error = None
+    db.commit()
+
+def run_pending_jobs(db: Session, max_jobs: Optional[int] = None) -> int:
+    """Drains jobs that are due right now (up to max_jobs). Used by workers, the cron route and tests. Returns the number run."""
+    count = 0
+    while max_jobs is None or count < max_jobs:
+        db_job = _claim_next_job(db)
+        if db_job is None:
+            return count
+        run_job(db, db_job)
+        count += 1
+    return count
+
+def requeue_stale_jobs(db: Session) -> int:
+    """Puts RUNNING jobs abandoned by a crashed worker back in the queue."""
+    cutoff = datetime.utcnow() - timedelta(seconds=STALE_JOB_SECONDS)
+    count = db.query(models.Job).filter(
+        models.Job.status == models.JobStatus.RUNNING,
+        models.Job.started_at < cutoff
+    ).update({models.Job.status: models.JobStatus.PENDING}, synchronize_session=False)
+    db.commit()
+    return count
+
+def purge_done_jobs(db: Session) -> int:
+    """Deletes successfully finished jobs past the retention window."""
+    cutoff = datetime.utcnow() - timedelta(days=DONE_JOB_RETENTION_DAYS)
+    count = db.query(models.Job).filter(
+        models.Job.status == models.JobStatus.DONE,
+        models.Job.finished_at < cutoff
+    ).delete(synchronize_session=False)
+    db.commit()
+    return count
+
+def run_maintenance(db: Session):
+    requeued = requeue_stale_jobs(db)
+    if requeued:
+        print(f"Requeued {requeued} stale job(s).")
+    purge_done_jobs(db)
+
+def run_due_jobs():
+    """Drains due jobs in a fresh session (the request's session is closed by then)."""
+    db = SessionLocal()
+    try:
+        return run_pending_jobs(db, max_jobs=CRON_MAX_JOBS)
+    finally:
+        db.close()
+
+def schedule_drain(background_tasks):
+    """
+    Without worker threads, runs due jobs after the response has been sent,
+    so the handler still returns immediately but mail goes out promptly.
+    """
+    if not USE_WORKER_THREADS:
+        background_tasks.add_task(run_due_jobs)
+
+
+class WorkerPool:
+    """A fixed number of threads that poll the jobs table and run handlers."""
+
+    def __init__(self, size: int = WORKER_COUNT):
+        self.size = size
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._maintenance_lock = threading.Lock()
+        self._next_maintenance = datetime.utcnow()
+
+    def start(self):
+        self._run_maintenance()
+        for i in range(self.size):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads.clear()
+
+    def wake(self):
+        self._wakeup.set()
+
+    def _run_maintenance(self):
+        """Housekeeping done by at most one worker per interval."""
+        with self._maintenance_lock:
+            if datetime.utcnow() < self._next_maintenance:
+                return
+            self._next_maintenance = datetime.utcnow() + timedelta(seconds=MAINTENANCE_INTERVAL_SECONDS)
+        db = SessionLocal()
+        try:
+            run_maintenance(db)
+        except Exception as e:
+            print(f"Job maintenance error: {e}")
+        finally:
+            db.close()
+
+    def _work(self):
+        while not self._stop.is_set():
+            self._run_maintenance()
+            db = SessionLocal()
+            try:
+                ran = run_pending_jobs(db)
+            except Exception as e:
+                print(f"Job worker error: {e}")
+                ran = 0
+            finally:
+                db.close()
+            if not ran:
+                self._wakeup.wait(POLL_INTERVAL_SECONDS)
+                self._wakeup.clear()
+
+
+pool: Optional[WorkerPool] = None
+
+def start_workers(size: int = WORKER_COUNT):
+    global pool
+    if pool is None and USE_WORKER_THREADS:
+        pool = WorkerPool(size)
+        pool.start()
+    return pool
+
+def stop_workers():
+    global pool
+    if pool is not None:
+        pool.stop()
+        pool = None
+
+
+# --- Monitoring ---
+def get_queue_stats(db: Session):
+    """Queue depth per status plus wait/run latency over recently finished jobs."""
+    counts = dict(
+        db.query(models.Job.status, func.count(models.Job.id))
+        .group_by(models.Job.status).all()
+    )
+
+    now = datetime.utcnow()
+    oldest_pending = db.query(func.min(models.Job.created_at)).filter(
+        models.Job.status == models.JobStatus.PENDING
+    ).scalar()
+
+    recent = db.query(models.Job).filter(
+        models.Job.status == models.JobStatus.DONE
+    ).order_by(models.Job.finished_at.desc()).limit(LATENCY_SAMPLE_SIZE).all()
+    wait_times = [(j.started_at - j.created_at).total_seconds() for j in recent if j.started_at]
+    run_times = [(j.finished_at - j.started_at).total_seconds() for j in recent if j.started_at]
+
+    return {
+        "pending": counts.get(models.JobStatus.PENDING, 0),
+        "running": counts.get(models.JobStatus.RUNNING, 0),
+        "done": counts.get(models.JobStatus.DONE, 0),
+        "failed": counts.get(models.JobStatus.FAILED, 0),
+        "oldest_pending_age_seconds": (now - oldest_pending).total_seconds() if oldest_pending else None,
+        "avg_wait_seconds": sum(wait_times) / len(wait_times) if wait_times else None,
+        "avg_run_seconds": sum(run_times) / len(run_times) if run_times else None,
+        "workers": pool.size if pool is not None else 0,
+    }
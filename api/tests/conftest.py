@@ -0,0 +1,112 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from api import database, main, models, security, tasks, uploads
+
+
+@pytest.fixture
+def make_session(tmp_path):
+    # A file database so separate sessions really are independent connections
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+    models.Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    sessions = []
+
+    def make():
+        session = factory()
+        sessions.append(session)
+        return session
+
+    yield make
+    for session in sessions:
+        session.close()
+    engine.dispose()
+
+
+@pytest.fixture
+def db(make_session):
+    return make_session()
+
+
+@pytest.fixture
+def make_user(db):
+    def make(email, role=models.UserRole.attendee, name="Test User"):
+        user = models.User(name=name, email=email, hashed_password="x", role=role, is_approved=True)
+        db.add(user)
+        db.commit()
+        return user
+    return make
+
+
+@pytest.fixture
+def organizer(make_user):
+    return make_user("sdc@spit.com", role=models.UserRole.organizer, name="SDC")
+
+
+@pytest.fixture
+def attendee(make_user):
+    return make_user("attendee@spit.ac.in")
+
+
+@pytest.fixture
+def venue(db):
+    db_venue = models.Venue(name="Main Hall", location="Block A", capacity=200)
+    db.add(db_venue)
+    db.commit()
+    return db_venue
+
+
+@pytest.fixture
+def add_event(db, organizer, venue):
+    """Saves an event straight to the database; defaults to a free event tomorrow."""
+    def add(start=None, end=None, capacity=10, cost=0.0, title="Talk", organizer_id=None):
+        start = start or datetime.utcnow() + timedelta(days=1)
+        db_event = models.Event(title=title, description="-", event_datetime=start,
+                                end_datetime=end or start + timedelta(hours=1),
+                                capacity=capacity, cost=cost, venue_id=venue.id,
+                                organizer_id=organizer_id or organizer.id)
+        db.add(db_event)
+        db.commit()
+        return db_event
+    return add
+
+
+@pytest.fixture
+def mail_sink():
+    sink = tasks.MemorySink()
+    previous = tasks.mailer
+    tasks.set_mailer(sink)
+    yield sink
+    tasks.set_mailer(previous)
+
+
+@pytest.fixture
+def client(make_session, tmp_path, monkeypatch):
+    """
+    TestClient against the test database. Call client.login(user) to pick
+    who the requests are made as. Uploads go to a temp directory.
+    """
+    monkeypatch.setattr(uploads, "UPLOAD_DIR", str(tmp_path / "uploads"))
+    current = {}
+
+    def get_test_db():
+        session = make_session()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    def get_test_user():
+        session = make_session()
+        return session.get(models.User, current["user_id"])
+
+    main.app.dependency_overrides[database.get_db] = get_test_db
+    main.app.dependency_overrides[security.get_current_user] = get_test_user
+    test_client = TestClient(main.app)
+    test_client.login = lambda user: current.update(user_id=user.id)
+    yield test_client
+    main.app.dependency_overrides.clear()
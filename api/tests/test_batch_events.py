@@ -0,0 +1,119 @@
+from datetime import datetime, timedelta
+
+from api import crud, schemas
+
+
+def at(hour, minute=0):
+    return datetime(2026, 1, 20, hour, minute)
+
+
+def make_event(venue, title, start, end):
+    return schemas.EventCreate(title=title, description="-", event_datetime=start, end_datetime=end,
+                               capacity=50, venue_id=venue.id, cost=0.0)
+
+
+def test_batch_event_starting_before_saved_event_is_rejected(db, organizer, venue, add_event):
+    saved = add_event(at(10), at(12))
+
+    created, conflicts = crud.create_events_batch(
+        db, [make_event(venue, "Early", at(9), at(11))], organizer_id=organizer.id)
+
+    assert created == []
+    assert [(c["index"], c["conflicting_event_id"]) for c in conflicts] == [(0, saved.id)]
+
+
+def test_batch_event_containing_saved_event_is_rejected(db, organizer, venue, add_event):
+    saved = add_event(at(10), at(11))
+
+    created, conflicts = crud.create_events_batch(
+        db, [make_event(venue, "Long", at(9), at(13))], organizer_id=organizer.id)
+
+    assert created == []
+    assert [(c["index"], c["conflicting_event_id"]) for c in conflicts] == [(0, saved.id)]
+
+
+def test_batch_event_starting_during_saved_event_is_rejected(db, organizer, venue, add_event):
+    saved = add_event(at(10), at(12))
+
+    created, conflicts = crud.create_events_batch(
+        db, [make_event(venue, "Late", at(11), at(13))], organizer_id=organizer.id)
+
+    assert created == []
+    assert conflicts[0]["conflicting_event_id"] == saved.id
+
+
+def test_batch_overlaps_within_batch_keep_earliest(db, organizer, venue):
+    batch = [
+        make_event(venue, "Second", at(10), at(12)),
+        make_event(venue, "First", at(9), at(11)),
+        make_event(venue, "Third", at(12), at(13)),
+    ]
+
+    created, conflicts = crud.create_events_batch(db, batch, organizer_id=organizer.id)
+
+    assert [e.title for e in created] == ["First", "Third"]
+    assert [(c["index"], c["conflicting_index"]) for c in conflicts] == [(0, 1)]
+
+
+def test_event_rejected_by_saved_event_does_not_block_batch(db, organizer, venue, add_event):
+    add_event(at(10), at(11))
+    batch = [
+        make_event(venue, "Clashes with saved", at(9), at(12)),
+        make_event(venue, "Free slot", at(11), at(12)),
+    ]
+
+    created, conflicts = crud.create_events_batch(db, batch, organizer_id=organizer.id)
+
+    assert [e.title for e in created] == ["Free slot"]
+    assert [c["index"] for c in conflicts] == [0]
+
+
+def test_back_to_back_events_do_not_conflict(db, organizer, venue, add_event):
+    add_event(at(10), at(11))
+    batch = [
+        make_event(venue, "Before", at(9), at(10)),
+        make_event(venue, "After", at(11), at(12)),
+    ]
+
+    created, conflicts = crud.create_events_batch(db, batch, organizer_id=organizer.id)
+
+    assert [e.title for e in created] == ["Before", "After"]
+    assert conflicts == []
+
+
+def batch_payload(venue, *slots):
+    return {"events": [
+        {"title": f"Session {i}", "description": "-", "event_datetime": start.isoformat(),
+         "end_datetime": end.isoformat(), "capacity": 50, "venue_id": venue.id, "cost": 0}
+        for i, (start, end) in enumerate(slots)
+    ]}
+
+
+def test_batch_route_returns_201_when_events_are_created(client, organizer, venue):
+    client.login(organizer)
+
+    response = client.post("/api/organizer/events/batch", json=batch_payload(venue, (at(9), at(10))))
+
+    assert response.status_code == 201
+    assert len(response.json()["created"]) == 1
+
+
+def test_batch_route_returns_200_when_everything_conflicts(client, organizer, venue, add_event):
+    add_event(at(9), at(12))
+    client.login(organizer)
+
+    response = client.post("/api/organizer/events/batch", json=batch_payload(venue, (at(10), at(11))))
+
+    assert response.status_code == 200
+    assert response.json()["created"] == []
+    assert len(response.json()["conflicts"]) == 1
+
+
+def test_batch_route_rejects_oversized_batch(client, organizer, venue):
+    client.login(organizer)
+    slots = [(at(0) + timedelta(minutes=i), at(0) + timedelta(minutes=i + 1))
+             for i in range(schemas.MAX_BATCH_EVENTS + 1)]
+
+    response = client.post("/api/organizer/events/batch", json=batch_payload(venue, *slots))
+
+    assert response.status_code == 422
@@ -0,0 +1,56 @@
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from api import crud, models
+
+
+def test_concurrent_duplicate_booking_returns_error(make_session, add_event, attendee, monkeypatch):
+    event_id, attendee_id = add_event().id, attendee.id
+    first, second = make_session(), make_session()
+
+    # Both requests pass the duplicate check before either has inserted
+    monkeypatch.setattr(crud, "get_booking_by_attendee_and_event", lambda *args: None)
+
+    assert isinstance(crud.create_booking(first, event_id, attendee_id), models.Booking)
+    assert crud.create_booking(second, event_id, attendee_id) == {"error": "You have already booked this event."}
+
+
+def test_rebooking_after_cancel_reuses_row(db, add_event, attendee):
+    event_id = add_event().id
+
+    booking = crud.create_booking(db, event_id, attendee.id)
+    cancelled = crud.cancel_booking(db, booking.id, attendee.id)
+    assert cancelled.status == models.BookingStatus.CANCELLED
+
+    rebooked = crud.create_booking(db, event_id, attendee.id)
+    assert rebooked.id == booking.id
+    assert rebooked.status == models.BookingStatus.CONFIRMED
+    assert db.query(models.Booking).count() == 1
+
+
+def test_cancel_someone_elses_booking_is_not_found(client, db, add_event, attendee, make_user):
+    booking = crud.create_booking(db, add_event().id, attendee.id)
+    client.login(make_user("other@spit.ac.in"))
+
+    response = client.post(f"/api/bookings/{booking.id}/cancel")
+
+    assert response.status_code == 404
+    db.refresh(booking)
+    assert booking.status == models.BookingStatus.CONFIRMED
+
+
+def test_cancel_already_cancelled_booking_conflicts(client, db, add_event, attendee):
+    booking = crud.create_booking(db, add_event().id, attendee.id)
+    client.login(attendee)
+
+    assert client.post(f"/api/bookings/{booking.id}/cancel").status_code == 200
+    response = client.post(f"/api/bookings/{booking.id}/cancel")
+
+    assert response.status_code == 409
+    assert response.json()["detail"] == "Only active bookings can be cancelled."
+
+
+def test_other_integrity_errors_are_not_reported_as_duplicates(db, add_event):
+    # attendee_id is NOT NULL, so the insert fails for a reason other than a duplicate
+    with pytest.raises(IntegrityError):
+        crud.create_booking(db, add_event().id, None)
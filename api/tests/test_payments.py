@@ -0,0 +1,158 @@
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from api import crud, models, schemas, uploads
+
+
+def upload(client, booking, content=b"%PDF-1.4 proof", filename="proof.pdf", content_type="application/pdf"):
+    return client.post(f"/api/bookings/{booking.id}/payment-proof",
+                       files={"file": (filename, content, content_type)})
+
+
+def test_paid_booking_waits_for_payment(db, add_event, attendee):
+    booking = crud.create_booking(db, add_event(cost=50.0).id, attendee.id)
+
+    assert booking.status == models.BookingStatus.PENDING_PAYMENT
+
+
+def test_upload_stores_proof_by_hash(client, db, add_event, attendee):
+    booking = crud.create_booking(db, add_event(cost=50.0).id, attendee.id)
+    client.login(attendee)
+
+    response = upload(client, booking)
+
+    assert response.status_code == 200
+    db.refresh(booking)
+    assert os.path.basename(booking.payment_proof_path) == booking.payment_proof_sha256 + ".pdf"
+    assert os.path.exists(booking.payment_proof_path)
+
+
+def test_upload_over_limit_is_rejected_while_streaming(client, db, add_event, attendee):
+    booking = crud.create_booking(db, add_event(cost=50.0).id, attendee.id)
+    client.login(attendee)
+
+    # Small enough to pass the Content-Length precheck, caught by the streaming count
+    response = upload(client, booking, content=b"x" * (uploads.MAX_PROOF_BYTES + 1))
+
+    assert response.status_code == 413
+    assert os.listdir(uploads.UPLOAD_DIR) == [] # The partial temp file is removed
+
+
+def test_upload_with_oversized_content_length_is_rejected_up_front(client, db, add_event, attendee):
+    booking = crud.create_booking(db, add_event(cost=50.0).id, attendee.id)
+    client.login(attendee)
+
+    response = upload(client, booking,
+                      content=b"x" * (uploads.MAX_PROOF_BYTES + uploads.MULTIPART_OVERHEAD_BYTES + 1))
+
+    assert response.status_code == 413
+    assert not os.path.exists(uploads.UPLOAD_DIR) # Nothing was written
+
+
+def test_upload_of_wrong_type_is_rejected(client, db, add_event, attendee):
+    booking = crud.create_booking(db, add_event(cost=50.0).id, attendee.id)
+    client.login(attendee)
+
+    response = upload(client, booking, content=b"GIF89a", filename="proof.gif", content_type="image/gif")
+
+    assert response.status_code == 415
+    assert os.listdir(uploads.UPLOAD_DIR) == []
+
+
+def test_same_proof_is_refused_for_another_booking(client, db, add_event, attendee, make_user):
+    paid_event = add_event(cost=50.0)
+    other = make_user("other@spit.ac.in")
+    first = crud.create_booking(db, paid_event.id, attendee.id)
+    second = crud.create_booking(db, paid_event.id, other.id)
+
+    client.login(attendee)
+    assert upload(client, first).status_code == 200
+    client.login(other)
+    response = upload(client, second)
+
+    assert response.status_code == 409
+    db.refresh(second)
+    assert second.payment_proof_path is None
+
+
+def test_upload_after_payment_deadline_is_refused(client, db, add_event, attendee):
+    booking = crud.create_booking(db, add_event(cost=50.0).id, attendee.id)
+    booking.booking_time = datetime.utcnow() - timedelta(hours=crud.PAYMENT_DEADLINE_HOURS + 1)
+    db.commit()
+    client.login(attendee)
+
+    response = upload(client, booking)
+
+    assert response.status_code == 409
+    assert "deadline" in response.json()["detail"]
+
+
+def test_expired_hold_releases_seat(db, add_event, attendee, make_user):
+    paid_event = add_event(cost=50.0, capacity=1)
+    hold = crud.create_booking(db, paid_event.id, attendee.id)
+    hold.booking_time = datetime.utcnow() - timedelta(hours=crud.PAYMENT_DEADLINE_HOURS + 1)
+    db.commit()
+
+    booking = crud.create_booking(db, paid_event.id, make_user("other@spit.ac.in").id)
+
+    assert isinstance(booking, models.Booking)
+    db.refresh(hold)
+    assert hold.status == models.BookingStatus.CANCELLED
+
+
+def test_rejected_proof_cannot_be_resubmitted_after_rebooking(client, db, add_event, attendee, organizer):
+    paid_event = add_event(cost=50.0)
+    booking = crud.create_booking(db, paid_event.id, attendee.id)
+    client.login(attendee)
+    assert upload(client, booking).status_code == 200
+    db.refresh(booking)
+    rejected_path = booking.payment_proof_path
+
+    crud.review_payments(db, organizer.id, [schemas.PaymentDecision(booking_id=booking.id, approve=False)])
+    rebooked = crud.create_booking(db, paid_event.id, attendee.id)
+
+    assert rebooked.id == booking.id
+    assert not os.path.exists(rejected_path) # No orphaned file
+    assert upload(client, rebooked).status_code == 409
+    assert upload(client, rebooked, content=b"%PDF-1.4 new proof").status_code == 200
+
+
+def test_review_payments_mixed_batch(db, add_event, organizer, make_user, tmp_path):
+    def booking_with_proof(event_id, email):
+        db_booking = crud.create_booking(db, event_id, make_user(email).id)
+        path = tmp_path / f"{email}.pdf"
+        path.write_bytes(email.encode())
+        return crud.attach_payment_proof(db, db_booking, str(path), sha256=email)
+
+    paid_event = add_event(cost=50.0, capacity=2)
+    approved = booking_with_proof(paid_event.id, "approve@spit.ac.in")
+    rejected = booking_with_proof(paid_event.id, "reject@spit.ac.in")
+    not_pending = crud.create_booking(db, add_event(title="Free").id, make_user("free@spit.ac.in").id)
+    other_organizer = make_user("ecell@spit.com", role=models.UserRole.organizer)
+    foreign = booking_with_proof(add_event(cost=50.0, organizer_id=other_organizer.id).id, "foreign@spit.ac.in")
+
+    late = make_user("late@spit.ac.in")
+    assert crud.create_booking(db, paid_event.id, late.id) == {"error": "Sorry, this event is already full."}
+
+    commits = []
+    event.listen(db, "after_commit", lambda session: commits.append(session))
+    results = crud.review_payments(db, organizer.id, [
+        schemas.PaymentDecision(booking_id=approved.id, approve=True),
+        schemas.PaymentDecision(booking_id=rejected.id, approve=False),
+        schemas.PaymentDecision(booking_id=not_pending.id, approve=True),
+        schemas.PaymentDecision(booking_id=foreign.id, approve=True),
+    ])
+
+    assert len(commits) == 1
+    assert results[0] == {"booking_id": approved.id, "status": models.BookingStatus.CONFIRMED}
+    assert results[1] == {"booking_id": rejected.id, "status": models.BookingStatus.REJECTED}
+    assert results[2]["error"] == "Booking is not awaiting payment verification."
+    assert results[3] == {"booking_id": foreign.id, "error": "Booking not found."}
+
+    db.refresh(foreign)
+    assert foreign.status == models.BookingStatus.PENDING_PAYMENT
+    # Rejecting released a seat, and each decision queued an email
+    assert isinstance(crud.create_booking(db, paid_event.id, late.id), models.Booking)
+    assert db.query(models.Job).filter(models.Job.kind == "send_payment_review_result").count() == 2
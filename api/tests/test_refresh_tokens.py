@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta
+
+from api import crud, models, security
+
+
+def token_row(db, token):
+    return db.query(models.RefreshToken).filter(
+        models.RefreshToken.token_hash == security.hash_refresh_token(token)
+    ).first()
+
+
+def test_rotation_issues_new_token_and_revokes_old(db, attendee):
+    token = crud.create_refresh_token(db, user_id=attendee.id)
+
+    user, new_token = crud.rotate_refresh_token(db, token)
+
+    assert user.id == attendee.id
+    assert new_token != token
+    assert token_row(db, token).revoked_at is not None
+    assert token_row(db, new_token).revoked_at is None
+    assert token_row(db, new_token).family_id == token_row(db, token).family_id
+
+
+def test_only_the_hash_is_stored(db, attendee):
+    token = crud.create_refresh_token(db, user_id=attendee.id)
+
+    row = token_row(db, token)
+
+    assert len(row.token_hash) == 32
+    assert token.encode() not in row.token_hash
+
+
+def test_reusing_rotated_token_revokes_whole_family(db, attendee):
+    token = crud.create_refresh_token(db, user_id=attendee.id)
+    other_session = crud.create_refresh_token(db, user_id=attendee.id)
+    _, current = crud.rotate_refresh_token(db, token)
+
+    assert crud.rotate_refresh_token(db, token) is None
+
+    assert token_row(db, current).revoked_at is not None
+    assert crud.rotate_refresh_token(db, current) is None
+    # A separate login (different family) is unaffected
+    assert token_row(db, other_session).revoked_at is None
+
+
+def test_expired_token_is_refused(db, attendee):
+    token = crud.create_refresh_token(db, user_id=attendee.id)
+    row = token_row(db, token)
+    row.expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+
+    assert crud.rotate_refresh_token(db, token) is None
+
+
+def test_unknown_token_is_refused(db):
+    assert crud.rotate_refresh_token(db, "not-a-real-token") is None
+
+
+def test_expired_tokens_are_purged_when_issuing(db, attendee):
+    token = crud.create_refresh_token(db, user_id=attendee.id)
+    token_row(db, token).expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+
+    crud.create_refresh_token(db, user_id=attendee.id)
+
+    assert token_row(db, token) is None
+    assert db.query(models.RefreshToken).count() == 1
+
+
+def test_logout_revokes_session(db, attendee):
+    token = crud.create_refresh_token(db, user_id=attendee.id)
+    _, current = crud.rotate_refresh_token(db, token)
+
+    assert crud.revoke_refresh_token(db, current) is True
+
+    assert crud.rotate_refresh_token(db, current) is None
+    assert crud.revoke_refresh_token(db, "not-a-real-token") is False
+
+
+def test_refresh_and_logout_routes(client, db, attendee):
+    token = crud.create_refresh_token(db, user_id=attendee.id)
+
+    response = client.post("/api/token/refresh", json={"refresh_token": token})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["access_token"] and body["refresh_token"] != token
+
+    assert client.post("/api/token/refresh", json={"refresh_token": token}).status_code == 401
+
+    token = crud.create_refresh_token(db, user_id=attendee.id)
+    assert client.post("/api/logout", json={"refresh_token": token}).status_code == 204
+    assert client.post("/api/token/refresh", json={"refresh_token": token}).status_code == 401
@@ -0,0 +1,180 @@
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+
+from api import models, tasks
+
+
+@pytest.fixture
+def recorded(monkeypatch):
+    """Registers a "record" task that remembers each payload it ran with."""
+    calls = []
+    lock = threading.Lock()
+
+    def record(db, n):
+        with lock:
+            calls.append(n)
+
+    monkeypatch.setitem(tasks.TASKS, "record", record)
+    return calls
+
+
+@pytest.fixture
+def failing(monkeypatch):
+    def fail(db):
+        raise RuntimeError("SMTP down")
+
+    monkeypatch.setitem(tasks.TASKS, "fail", fail)
+
+
+def test_job_is_visible_only_after_commit(make_session, recorded):
+    writer, worker = make_session(), make_session()
+
+    tasks.enqueue(writer, "record", {"n": 1})
+    writer.flush()
+    assert tasks.run_pending_jobs(worker) == 0
+
+    writer.commit()
+    assert tasks.run_pending_jobs(worker) == 1
+    assert recorded == [1]
+
+
+def test_job_is_dropped_on_rollback(db, recorded):
+    tasks.enqueue(db, "record", {"n": 1})
+    db.rollback()
+
+    assert tasks.run_pending_jobs(db) == 0
+    assert db.query(models.Job).count() == 0
+
+
+def test_enqueue_rejects_unknown_task(db):
+    with pytest.raises(ValueError):
+        tasks.enqueue(db, "no_such_task")
+
+
+def test_failed_job_backs_off_then_fails_after_max_attempts(db, failing):
+    db_job = tasks.enqueue(db, "fail", max_attempts=2)
+    db.commit()
+
+    before = datetime.utcnow()
+    assert tasks.run_pending_jobs(db) == 1
+    db.refresh(db_job)
+    assert db_job.status == models.JobStatus.PENDING
+    assert db_job.attempts == 1
+    assert db_job.run_at >= before + timedelta(seconds=tasks.RETRY_BASE_SECONDS)
+    assert "SMTP down" in db_job.last_error
+
+    # Not due yet, so nothing runs
+    assert tasks.run_pending_jobs(db) == 0
+
+    db_job.run_at = datetime.utcnow()
+    db.commit()
+    assert tasks.run_pending_jobs(db) == 1
+    db.refresh(db_job)
+    assert db_job.status == models.JobStatus.FAILED
+    assert db_job.attempts == 2
+    assert db_job.finished_at is not None
+
+
+def test_backoff_doubles_and_is_capped():
+    assert tasks._backoff(1) == timedelta(seconds=tasks.RETRY_BASE_SECONDS)
+    assert tasks._backoff(2) == timedelta(seconds=tasks.RETRY_BASE_SECONDS * 2)
+    assert tasks._backoff(50) == timedelta(seconds=tasks.RETRY_MAX_SECONDS)
+
+
+def test_each_job_is_claimed_by_exactly_one_worker(make_session, recorded):
+    db = make_session()
+    for n in range(30):
+        tasks.enqueue(db, "record", {"n": n})
+    db.commit()
+
+    errors = []
+    sessions = [make_session() for _ in range(4)]
+
+    def work(session):
+        try:
+            tasks.run_pending_jobs(session)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(session,)) for session in sessions]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert Counter(recorded) == Counter(range(30))
+
+
+def test_stale_running_job_is_requeued(db):
+    stale = models.Job(kind="record", payload="{}", status=models.JobStatus.RUNNING,
+                       started_at=datetime.utcnow() - timedelta(seconds=tasks.STALE_JOB_SECONDS + 1))
+    fresh = models.Job(kind="record", payload="{}", status=models.JobStatus.RUNNING,
+                       started_at=datetime.utcnow())
+    db.add_all([stale, fresh])
+    db.commit()
+
+    assert tasks.requeue_stale_jobs(db) == 1
+    db.refresh(stale)
+    db.refresh(fresh)
+    assert stale.status == models.JobStatus.PENDING
+    assert fresh.status == models.JobStatus.RUNNING
+
+
+def test_old_done_jobs_are_purged(db):
+    old = datetime.utcnow() - timedelta(days=tasks.DONE_JOB_RETENTION_DAYS + 1)
+    db.add_all([
+        models.Job(kind="record", payload="{}", status=models.JobStatus.DONE, finished_at=old),
+        models.Job(kind="record", payload="{}", status=models.JobStatus.DONE, finished_at=datetime.utcnow()),
+        models.Job(kind="record", payload="{}", status=models.JobStatus.FAILED, finished_at=old),
+    ])
+    db.commit()
+
+    assert tasks.purge_done_jobs(db) == 1
+    assert db.query(models.Job).count() == 2
+
+
+def test_queue_stats_counts(db, recorded, failing):
+    for n in range(3):
+        tasks.enqueue(db, "record", {"n": n})
+    tasks.enqueue(db, "fail", max_attempts=1)
+    db.commit()
+    tasks.run_pending_jobs(db)
+    tasks.enqueue(db, "record", {"n": 3})
+    db.add(models.Job(kind="record", payload="{}", status=models.JobStatus.RUNNING,
+                      started_at=datetime.utcnow()))
+    db.commit()
+
+    stats = tasks.get_queue_stats(db)
+
+    assert (stats["pending"], stats["running"], stats["done"], stats["failed"]) == (1, 1, 3, 1)
+    assert stats["oldest_pending_age_seconds"] is not None
+    assert stats["avg_wait_seconds"] is not None
+    assert stats["avg_run_seconds"] is not None
+
+
+def test_booking_confirmation_is_mailed_to_sink(db, mail_sink, add_event, attendee):
+    from api import crud
+
+    crud.create_booking(db, add_event(title="Hackathon").id, attendee.id)
+    assert mail_sink.messages == [] # Nothing is sent inside the request
+
+    assert tasks.run_pending_jobs(db) == 1
+    [message] = mail_sink.messages
+    assert message["To"] == attendee.email
+    assert message["Subject"] == "Booking confirmed: Hackathon"
+
+
+def test_booking_route_drains_queue_after_response_without_workers(client, make_session, mail_sink,
+                                                                   add_event, attendee, monkeypatch):
+    monkeypatch.setattr(tasks, "USE_WORKER_THREADS", False)
+    monkeypatch.setattr(tasks, "SessionLocal", make_session)
+    client.login(attendee)
+
+    response = client.post(f"/api/events/{add_event().id}/book")
+
+    assert response.status_code == 200
+    assert [message["To"] for message in mail_sink.messages] == [attendee.email]
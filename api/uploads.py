@@ -0,0 +1,151 @@
+import hashlib
+import os
+import tempfile
+from fastapi import HTTPException, Request, status
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ModuleNotFoundError: # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+# --- Upload Settings ---
+# Like the database, uploads live under /tmp so they work on read-only deploys
+UPLOAD_DIR = "/tmp/festfrenzy_uploads"
+MAX_PROOF_BYTES = 5 * 1024 * 1024
+MULTIPART_OVERHEAD_BYTES = 16 * 1024 # Room for boundaries and part headers in Content-Length
+ALLOWED_PROOF_TYPES = {
+    "image/png": ".png",
+    "image/jpeg": ".jpg",
+    "application/pdf": ".pdf",
+}
+
+
+class _FilePartWriter:
+    """
+    Callbacks for MultipartParser. Writes the first file part of the form
+    straight to a temp file while hashing it, so only one network chunk
+    is ever held in memory.
+    """
+
+    def __init__(self, temp_file, max_bytes: int):
+        self.temp_file = temp_file
+        self.max_bytes = max_bytes
+        self.hasher = hashlib.sha256()
+        self.size = 0
+        self.content_type = None
+        self.found_file = False
+        self._in_file = False
+        self._headers = {}
+        self._field = b""
+        self._value = b""
+
+    def callbacks(self):
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+    def on_part_begin(self):
+        self._headers = {}
+
+    def on_header_field(self, data, start, end):
+        self._field += data[start:end]
+
+    def on_header_value(self, data, start, end):
+        self._value += data[start:end]
+
+    def on_header_end(self):
+        self._headers[self._field.lower()] = self._value
+        self._field = b""
+        self._value = b""
+
+    def on_headers_finished(self):
+        _, disposition = parse_options_header(self._headers.get(b"content-disposition", b""))
+        # Only the first part that carries a filename is treated as the proof
+        if b"filename" in disposition and not self.found_file:
+            self.found_file = True
+            self._in_file = True
+            content_type, _ = parse_options_header(self._headers.get(b"content-type", b""))
+            self.content_type = content_type.decode("latin-1").lower()
+            if self.content_type not in ALLOWED_PROOF_TYPES:
+                raise HTTPException(
+                    status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                    detail="Payment proof must be a PNG, JPEG or PDF file."
+                )
+
+    def on_part_data(self, data, start, end):
+        if not self._in_file:
+            return
+        chunk = data[start:end]
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Payment proof must be {self.max_bytes // (1024 * 1024)} MB or smaller."
+            )
+        self.hasher.update(chunk)
+        self.temp_file.write(chunk)
+
+    def on_part_end(self):
+        self._in_file = False
+
+
+async def receive_payment_proof(request: Request, max_bytes: int = MAX_PROOF_BYTES):
+    """
+    Streams a multipart/form-data upload to a temp file in chunks, hashing as it goes.
+    Returns (temp_path, sha256_hex, extension). Pass them to store_payment_proof
+    once the upload is accepted, or remove_file(temp_path) to discard it.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data upload.")
+
+    # Reject obviously oversized uploads before reading a single byte
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes + MULTIPART_OVERHEAD_BYTES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Payment proof must be {max_bytes // (1024 * 1024)} MB or smaller."
+        )
+
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    temp_file = tempfile.NamedTemporaryFile(dir=UPLOAD_DIR, suffix=".part", delete=False)
+    try:
+        writer = _FilePartWriter(temp_file, max_bytes)
+        parser = MultipartParser(boundary, writer.callbacks())
+        async for chunk in request.stream():
+            parser.write(chunk)
+        parser.finalize()
+        temp_file.close()
+
+        if not writer.found_file or writer.size == 0:
+            raise HTTPException(status_code=400, detail="No payment proof file was uploaded.")
+        return temp_file.name, writer.hasher.hexdigest(), ALLOWED_PROOF_TYPES[writer.content_type]
+    except BaseException:
+        temp_file.close()
+        remove_file(temp_file.name)
+        raise
+
+
+def store_payment_proof(temp_path: str, sha256: str, extension: str) -> str:
+    """
+    Moves an accepted upload to its permanent, content-addressed path.
+    Identical content is stored once. Returns the final path.
+    """
+    path = os.path.join(UPLOAD_DIR, sha256 + extension)
+    if os.path.exists(path):
+        remove_file(temp_path) # Same content already stored
+    else:
+        os.replace(temp_path, path)
+    return path
+
+
+def remove_file(path: str):
+    if path and os.path.exists(path):
+        os.remove(path)
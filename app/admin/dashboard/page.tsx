@@ -10,6 +10,7 @@ import { Tabs, TabsContent, TabsList, TabsTrigger } from "@/components/ui/tabs"
 import { Table, TableBody, TableCell, TableHead, TableHeader, TableRow } from "@/components/ui/table"
 import { useRouter } from "next/navigation"
 import axios from "axios"
+import { clearTokens } from "@/lib/auth"
 import { Loader2 } from "lucide-react"
 
 // --- User Interface ---
@@ -72,13 +73,13 @@ export default function AdminDashboardPage() {
           setAdminUser(userData);
         } else {
           setError("You do not have permission to view this page.");
-          localStorage.removeItem("festfrenzy_token");
+          clearTokens();
           router.push("/login");
         }
       } catch (err: any) {
         console.error("Auth error:", err);
         setError(err.response?.data?.detail || "Session expired. Please log in again.");
-        localStorage.removeItem("festfrenzy_token");
+        clearTokens();
         router.push("/login");
       }
     }
@@ -14,6 +14,7 @@ import { Textarea } from "@/components/ui/textarea"
 // No need for Badge in this version
 import { useRouter } from "next/navigation"
 import axios from "axios"
+import { clearTokens } from "@/lib/auth"
 import { Loader2 } from "lucide-react"
 
 // --- Interfaces (Add end_datetime to Event) ---
@@ -93,13 +94,13 @@ export default function DashboardPage() {
           setUser(userData);
         } else {
           setError("You do not have permission to view this page.");
-          localStorage.removeItem("festfrenzy_token");
+          clearTokens();
           router.push("/login");
         }
       } catch (err: any) {
         console.error("Auth error:", err);
         setError(err.response?.data?.detail || "Session expired. Please log in again.");
-        localStorage.removeItem("festfrenzy_token");
+        clearTokens();
         router.push("/login");
       } finally {
         setLoadingUser(false);
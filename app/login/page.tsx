@@ -8,6 +8,7 @@ import { Label } from "@/components/ui/label"
 // Remove Tabs imports if not used elsewhere on the page
 import { useRouter } from "next/navigation"
 import axios from "axios"
+import { saveTokens } from "@/lib/auth"
 import { useToast } from "@/components/ui/use-toast"
 import { Toaster } from "@/components/ui/toaster";
 import { Loader2 } from "lucide-react"; // Make sure Loader2 is imported
@@ -41,8 +42,7 @@ export default function LoginPage() {
       const response = await axios.post("/api/organizer/login", params, {
         headers: { 'Content-Type': 'application/x-www-form-urlencoded' }
       });
-      const { access_token } = response.data;
-      localStorage.setItem("festfrenzy_token", access_token);
+      saveTokens(response.data); // Access token plus the refresh token that keeps the session alive
       router.push("/dashboard"); // Redirect, dashboard will handle role check
 
     } catch (err: any) {
@@ -1,6 +1,7 @@
 "use client"
 
 import { useRouter } from "next/navigation"
+import { logout } from "@/lib/auth"
 import { Button } from "@/components/ui/button"
 import { Avatar, AvatarFallback } from "@/components/ui/avatar"
 import { DropdownMenu, DropdownMenuContent, DropdownMenuItem, DropdownMenuTrigger } from "@/components/ui/dropdown-menu"
@@ -23,9 +24,9 @@ export function Header({ userName, userRole = "guest" }: HeaderProps) {
   const router = useRouter()
 
   // --- UPDATED LOGOUT FUNCTION ---
-  const handleLogout = () => {
-    // Clear the one token we use for authentication
-    localStorage.removeItem("festfrenzy_token");
+  const handleLogout = async () => {
+    // Revoke the refresh token on the server and clear both stored tokens
+    await logout();
     router.push("/login");
   }
 
@@ -0,0 +1,88 @@
+import axios, { AxiosError, InternalAxiosRequestConfig } from "axios"
+
+// Keys for the tokens returned by /api/organizer/login and /api/token/refresh
+export const TOKEN_KEY = "festfrenzy_token"
+export const REFRESH_TOKEN_KEY = "festfrenzy_refresh_token"
+
+interface TokenResponse {
+  access_token: string
+  refresh_token?: string | null
+}
+
+export function saveTokens({ access_token, refresh_token }: TokenResponse) {
+  localStorage.setItem(TOKEN_KEY, access_token)
+  if (refresh_token) {
+    localStorage.setItem(REFRESH_TOKEN_KEY, refresh_token)
+  }
+}
+
+export function clearTokens() {
+  localStorage.removeItem(TOKEN_KEY)
+  localStorage.removeItem(REFRESH_TOKEN_KEY)
+}
+
+// Revokes the session on the server (so the refresh token stops working), then forgets it locally
+export async function logout() {
+  const refreshToken = localStorage.getItem(REFRESH_TOKEN_KEY)
+  clearTokens()
+  if (refreshToken) {
+    try {
+      await axios.post("/api/logout", { refresh_token: refreshToken })
+    } catch (err) {
+      console.error("Logout request failed:", err)
+    }
+  }
+}
+
+// --- Silent refresh ---
+// Refresh tokens are single-use (rotated on every refresh), so requests that fail
+// together must share one refresh call instead of each sending the same token.
+let refreshInFlight: Promise<string | null> | null = null
+
+function refreshAccessToken(): Promise<string | null> {
+  if (!refreshInFlight) {
+    const refreshToken = localStorage.getItem(REFRESH_TOKEN_KEY)
+    refreshInFlight = (async () => {
+      if (!refreshToken) return null
+      try {
+        const response = await axios.post("/api/token/refresh", { refresh_token: refreshToken })
+        saveTokens(response.data)
+        return response.data.access_token as string
+      } catch (err) {
+        clearTokens()
+        return null
+      }
+    })().finally(() => {
+      refreshInFlight = null
+    })
+  }
+  return refreshInFlight
+}
+
+type RetriableConfig = InternalAxiosRequestConfig & { _retriedAfterRefresh?: boolean }
+
+const AUTH_URLS = ["/api/organizer/login", "/api/token/refresh", "/api/logout"]
+
+// On a 401, refresh the access token once and retry the request.
+// If that fails the original 401 reaches the page, which sends the user to /login.
+if (typeof window !== "undefined" && !(window as any).__festfrenzyAuthInterceptor) {
+  (window as any).__festfrenzyAuthInterceptor = true
+  axios.interceptors.response.use(undefined, async (error: AxiosError) => {
+    const config = error.config as RetriableConfig | undefined
+    if (
+      error.response?.status !== 401 ||
+      !config ||
+      config._retriedAfterRefresh ||
+      AUTH_URLS.includes(config.url ?? "")
+    ) {
+      return Promise.reject(error)
+    }
+    config._retriedAfterRefresh = true
+    const newToken = await refreshAccessToken()
+    if (!newToken) {
+      return Promise.reject(error)
+    }
+    config.headers.set("Authorization", `Bearer ${newToken}`)
+    return axios(config)
+  })
+}